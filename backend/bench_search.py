@@ -0,0 +1,181 @@
+"""Latency benchmark for `/api/search` over a synthetic corpus.
+
+Generates years of daily notes plus a few amals per day for one user and
+indexes them with `search.search_terms_for`. Two modes:
+
+- default: candidates come from an in-memory inverted index, then BM25 ranking
+  and pagination. No Mongo is involved, so these numbers are a lower bound on
+  the CPU cost, not the endpoint latency.
+- `--mongo`: seeds a scratch database at MONGO_URL with the (user_id,
+  search_terms) index and times `search.find_matches`, the query path the
+  endpoint runs (multikey `$in` fetch, stats lookup, ranking, page load).
+  The scratch database is dropped afterwards.
+
+Usage:
+    python bench_search.py [--years 1 3 5] [--queries 500] [--seed 42]
+    python bench_search.py --mongo [--db search_bench] [--years 1 3 5] [--queries 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Set
+
+from search import SEARCH_FIELDS, find_matches, query_terms, rank, search_terms_for
+
+ROOT_DIR = Path(__file__).parent
+PAGE_SIZE = 20
+
+AMAL_NAMES = [
+    "Sholat Dhuha", "Tilawah Al-Qur'an", "Sedekah Subuh", "Dzikir pagi", "Dzikir petang",
+    "Puasa Senin Kamis", "Sholat Tahajud", "Membaca buku hadits", "Kajian rutin", "Menghafal surat",
+]
+
+NOTE_FRAGMENTS = [
+    "Alhamdulillah hari ini bisa sholat berjamaah di masjid",
+    "membaca Al-Qur'an satu juz setelah Subuh",
+    "bersedekah kepada tetangga yang membutuhkan",
+    "merasa lebih tenang setelah berdzikir",
+    "mendengarkan kajian tentang kesabaran dan keikhlasan",
+    "berpuasa sunnah dan berbuka bersama keluarga",
+    "memperbaiki niat dalam bekerja",
+    "mendoakan orang tua setiap selesai sholat",
+    "belajar tafsir surat Al-Mulk",
+    "bersyukur atas kesehatan yang diberikan",
+    "lupa membaca dzikir petang karena kesibukan",
+    "menjaga lisan dari ghibah",
+    "memaafkan kesalahan teman",
+    "menghafalkan ayat baru dengan semangat",
+    "tersenyum kepada saudara adalah sedekah",
+]
+
+QUERIES = [
+    "sedekah", "sholat berjamaah", "membaca quran", "kesabaran", "puasa sunnah",
+    "doa orang tua", "dzikir petang", "tafsir", "bersyukur kesehatan", "menghafal ayat",
+    "ghibah", "keikhlasan niat", "masjid", "keluarga", "tahajud",
+]
+
+def build_corpus(years: int, rng: random.Random) -> List[dict]:
+    docs = []
+    start = date.today() - timedelta(days=365 * years)
+    for offset in range(365 * years):
+        day = start + timedelta(days=offset)
+        docs.append({
+            "collection": "daily_notes",
+            "date": day.isoformat(),
+            "notes": ". ".join(rng.sample(NOTE_FRAGMENTS, rng.randint(2, 5))),
+            "reflections": ". ".join(rng.sample(NOTE_FRAGMENTS, rng.randint(1, 3))),
+        })
+        for name in rng.sample(AMAL_NAMES, rng.randint(1, 4)):
+            docs.append({
+                "collection": "amals",
+                "scheduled_date": day.isoformat(),
+                "name": name,
+                "notes": rng.choice(NOTE_FRAGMENTS) if rng.random() < 0.5 else None,
+            })
+    return docs
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def report(label: str, docs: int, index_rate: float, latencies: List[float]):
+    print(
+        f"{label:<7} docs={docs:>6}  index={index_rate:>8.0f} docs/s  "
+        f"query p50={statistics.median(latencies):7.2f}ms  "
+        f"p95={percentile(latencies, 0.95):7.2f}ms  p99={percentile(latencies, 0.99):7.2f}ms"
+    )
+
+def run_benchmark(years: int, queries: int, rng: random.Random):
+    docs = build_corpus(years, rng)
+
+    started = time.perf_counter()
+    postings: Dict[str, Set[int]] = defaultdict(set)
+    total_terms = 0
+    for index, doc in enumerate(docs):
+        doc["search_terms"] = search_terms_for(doc["collection"], doc)
+        total_terms += len(doc["search_terms"])
+        for term in doc["search_terms"]:
+            postings[term].add(index)
+    index_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(queries):
+        query = rng.choice(QUERIES)
+        started = time.perf_counter()
+        terms = query_terms(query)
+        matches = set().union(*(postings.get(term, set()) for term in terms)) if terms else set()
+        ranked = rank(terms, [docs[i] for i in matches], len(docs), total_terms)
+        ranked = ranked[:PAGE_SIZE]
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    report(f"{years}y mem", len(docs), len(docs) / index_seconds, latencies)
+
+async def run_mongo_benchmark(db, years: int, queries: int, rng: random.Random):
+    docs = build_corpus(years, rng)
+    user_id = str(uuid.uuid4())
+
+    started = time.perf_counter()
+    by_collection = defaultdict(list)
+    for doc in docs:
+        collection = doc.pop("collection")
+        doc.update({"id": str(uuid.uuid4()), "user_id": user_id, "search_terms": search_terms_for(collection, doc)})
+        by_collection[collection].append(doc)
+    for collection, collection_docs in by_collection.items():
+        await db[collection].insert_many(collection_docs, ordered=False)
+    total_terms = sum(len(doc["search_terms"]) for doc in docs)
+    await db.search_stats.update_one({"_id": user_id}, {"$set": {"docs": len(docs), "terms": total_terms}}, upsert=True)
+    index_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(queries):
+        query = rng.choice(QUERIES)
+        started = time.perf_counter()
+        terms = query_terms(query)
+        if terms:
+            await find_matches(db, user_id, terms, 1, PAGE_SIZE)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    report(f"{years}y mongo", len(docs), len(docs) / index_seconds, latencies)
+
+async def run_mongo(db_name: str, years_list: List[int], queries: int, rng: random.Random):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[db_name]
+    try:
+        for collection in SEARCH_FIELDS:
+            await db[collection].create_index([("user_id", 1), ("search_terms", 1)])
+            await db[collection].create_index([("user_id", 1), ("id", 1)])
+        for years in years_list:
+            await run_mongo_benchmark(db, years, queries, rng)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search analysis and ranking latency.")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="Time the real query path against MONGO_URL")
+    parser.add_argument("--db", default="search_bench", help="Scratch database for --mongo (dropped afterwards)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.mongo:
+        asyncio.run(run_mongo(args.db, args.years, args.queries, rng))
+        return
+    for years in args.years:
+        run_benchmark(years, args.queries, rng)
+
+if __name__ == "__main__":
+    main()
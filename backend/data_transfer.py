@@ -0,0 +1,301 @@
+"""Bulk export/import of IbadahKu data as gzip-compressed NDJSON.
+
+The helpers here are shared by the per-user `/api/export` and `/api/import`
+endpoints in server.py and by the admin CLI below, which dumps or restores
+the whole database with one concurrent worker per collection.
+
+Usage:
+    python data_transfer.py export <out_dir> [--collections amals daily_notes ...]
+    python data_transfer.py import <in_dir> [--collections amals daily_notes ...]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple, Union
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+
+# Collections that make up a user's personal history
+USER_COLLECTIONS = ["amals", "daily_notes", "prayer_tracks"]
+
+CURSOR_BATCH_SIZE = 500
+WRITE_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 64 * 1024
+# Longest accepted NDJSON line; uploads use the smaller limit, full dumps allow any BSON document
+MAX_LINE_SIZE = 1024 * 1024
+MAX_DUMP_LINE_SIZE = 17 * 1024 * 1024
+GZIP_LEVEL = 6
+GZIP_MAGIC = b"\x1f\x8b"
+
+logger = logging.getLogger(__name__)
+
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded dump is not valid (optionally gzipped) NDJSON.
+
+    `line_number` is None for errors in the gzip stream itself.
+    """
+
+    def __init__(self, line_number: Optional[int], reason: str):
+        super().__init__(f"Line {line_number}: {reason}" if line_number is not None else reason)
+        self.line_number = line_number
+
+# ==================== ENCODING ====================
+
+def encode_line(doc: dict) -> bytes:
+    """Serialize a document as one NDJSON line, keeping BSON types round-trippable."""
+    return (json_util.dumps(doc, json_options=RELAXED_JSON_OPTIONS) + "\n").encode("utf-8")
+
+async def gzip_stream(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a stream of lines into gzip chunks without buffering the whole payload."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    async for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= READ_CHUNK_SIZE:
+            chunk = compressor.compress(b"".join(pending))
+            pending, pending_size = [], 0
+            if chunk:
+                yield chunk
+    tail = compressor.compress(b"".join(pending)) + compressor.flush()
+    if tail:
+        yield tail
+
+async def iter_cursor_lines(cursor, wrap: Optional[Callable[[dict], dict]] = None) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines straight from a Motor cursor."""
+    async for doc in cursor.batch_size(CURSOR_BATCH_SIZE):
+        yield encode_line(wrap(doc) if wrap else doc)
+
+# ==================== DECODING ====================
+
+async def iter_decoded_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Transparently gunzip a byte stream; plain NDJSON passes through untouched.
+
+    Concatenated gzip members (`cat a.gz b.gz`) are decoded one after the
+    other. A stream that ends inside a member raises ImportFormatError.
+    """
+    decompressor = None
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if first:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(31)
+        if decompressor is None:
+            yield chunk
+            continue
+        data = chunk
+        while True:
+            if decompressor.eof:
+                if not data:
+                    break
+                # Bytes after the end of a member start the next one
+                decompressor = zlib.decompressobj(31)
+            try:
+                # Cap each inflate step so a highly compressed upload can't balloon in memory
+                output = decompressor.decompress(data, READ_CHUNK_SIZE)
+            except zlib.error as e:
+                raise ImportFormatError(None, f"invalid gzip data: {e}")
+            if output:
+                yield output
+            data = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+            # A full step may leave inflated output pending even with no input left
+            if not data and len(output) < READ_CHUNK_SIZE:
+                break
+    if decompressor is not None and not decompressor.eof:
+        raise ImportFormatError(None, "gzip stream is truncated")
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes],
+    max_line_size: int = MAX_LINE_SIZE
+) -> AsyncIterator[Tuple[int, dict]]:
+    """Parse an (optionally gzipped) NDJSON byte stream into `(line_number, document)` pairs.
+
+    Blank lines are skipped but still counted, so line numbers match the file.
+    """
+    buffer = bytearray()
+    line_number = 0
+    async for data in iter_decoded_chunks(chunks):
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_number += 1
+            if end - start > max_line_size:
+                raise ImportFormatError(line_number, f"line exceeds {max_line_size} bytes")
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield line_number, _parse_line(line, line_number)
+        del buffer[:start]
+        # An unterminated line must not grow without bound
+        if len(buffer) > max_line_size:
+            raise ImportFormatError(line_number + 1, f"line exceeds {max_line_size} bytes")
+    if buffer.strip():
+        yield line_number + 1, _parse_line(bytes(buffer), line_number + 1)
+
+def _parse_line(line: bytes, line_number: int) -> dict:
+    try:
+        doc = json_util.loads(line.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ImportFormatError(line_number, str(e))
+    if not isinstance(doc, dict):
+        raise ImportFormatError(line_number, "expected a JSON object")
+    return doc
+
+async def iter_upload_chunks(read: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[bytes]:
+    """Adapt an async `read(size)` (e.g. UploadFile.read) into a chunk stream."""
+    while True:
+        chunk = await read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+# ==================== WRITING ====================
+
+class BatchWriter:
+    """Accumulate write operations and flush them with `bulk_write` in fixed-size chunks."""
+
+    def __init__(self, collection, batch_size: int = WRITE_BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.operations: List[Union[ReplaceOne, UpdateOne]] = []
+        self.written = 0
+        self.inserted = 0
+
+    async def add(self, operation: Union[ReplaceOne, UpdateOne]):
+        self.operations.append(operation)
+        if len(self.operations) >= self.batch_size:
+            await self.flush()
+
+    async def upsert(self, filter_: dict, doc: dict):
+        await self.add(ReplaceOne(filter_, doc, upsert=True))
+
+    async def flush(self):
+        if not self.operations:
+            return
+        operations, self.operations = self.operations, []
+        result = await self.collection.bulk_write(operations, ordered=False)
+        self.written += len(operations)
+        self.inserted += result.upserted_count + result.inserted_count
+
+# ==================== ADMIN CLI ====================
+
+def _dump_path(directory: Path, collection: str) -> Path:
+    return directory / f"{collection}.ndjson.gz"
+
+def _format_rate(count: int, size: int, elapsed: float) -> str:
+    elapsed = max(elapsed, 1e-6)
+    return f"{count} docs, {size / 1e6:.2f} MB in {elapsed:.2f}s ({count / elapsed:.0f} docs/s, {size / 1e6 / elapsed:.2f} MB/s)"
+
+def _write_batch(f, compressor, docs: List[dict]) -> int:
+    """Encode, compress and write one cursor batch; returns the compressed size."""
+    chunk = compressor.compress(b"".join(encode_line(doc) for doc in docs))
+    f.write(chunk)
+    return len(chunk)
+
+async def export_collection(db, collection: str, out_dir: Path) -> tuple:
+    """Dump one collection to `<out_dir>/<collection>.ndjson.gz`.
+
+    Encoding, compression and the file write run in a worker thread, so the
+    event loop only drives the cursors. zlib releases the GIL while it
+    compresses, which lets the collections compress in parallel.
+    """
+    started = time.perf_counter()
+    count = 0
+    size = 0
+    cursor = db[collection].find({}).batch_size(CURSOR_BATCH_SIZE)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    with open(_dump_path(out_dir, collection), "wb") as f:
+        while True:
+            docs = await cursor.to_list(CURSOR_BATCH_SIZE)
+            if not docs:
+                break
+            count += len(docs)
+            size += await asyncio.to_thread(_write_batch, f, compressor, docs)
+        tail = compressor.flush()
+        size += len(tail)
+        await asyncio.to_thread(f.write, tail)
+
+    logger.info(f"[export] {collection}: {_format_rate(count, size, time.perf_counter() - started)}")
+    return count, size
+
+async def import_collection(db, collection: str, in_dir: Path) -> tuple:
+    """Restore one collection from `<in_dir>/<collection>.ndjson.gz`, upserting on `_id` (or `id`)."""
+    path = _dump_path(in_dir, collection)
+    started = time.perf_counter()
+    writer = BatchWriter(db[collection])
+    skipped = 0
+
+    with open(path, "rb") as f:
+        async def read(size: int) -> bytes:
+            return await asyncio.to_thread(f.read, size)
+
+        async for line_number, doc in iter_ndjson(iter_upload_chunks(read), MAX_DUMP_LINE_SIZE):
+            if "_id" in doc:
+                await writer.upsert({"_id": doc["_id"]}, doc)
+            elif doc.get("id") is not None:
+                await writer.upsert({"id": doc["id"]}, doc)
+            else:
+                # Without a key the upsert would replace an arbitrary unkeyed document
+                skipped += 1
+                logger.warning(f"[import] {collection}: skipping line {line_number}, document has no '_id' or 'id'")
+        await writer.flush()
+
+    size = path.stat().st_size
+    logger.info(f"[import] {collection}: {_format_rate(writer.written, size, time.perf_counter() - started)}, {skipped} skipped")
+    return writer.written, size
+
+async def run(mode: str, directory: Path, collections: Optional[Iterable[str]]):
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'bedahni_db')]
+    try:
+        if mode == "export":
+            directory.mkdir(parents=True, exist_ok=True)
+            names = list(collections or await db.list_collection_names())
+            worker = export_collection
+        else:
+            names = list(collections or sorted(p.name[:-len(".ndjson.gz")] for p in directory.glob("*.ndjson.gz")))
+            worker = import_collection
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(worker(db, name, directory) for name in names))
+        total_count = sum(count for count, _ in results)
+        total_size = sum(size for _, size in results)
+        logger.info(f"[{mode}] total over {len(names)} collections: {_format_rate(total_count, total_size, time.perf_counter() - started)}")
+    finally:
+        client.close()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export or import the IbadahKu database as gzip NDJSON.")
+    parser.add_argument("mode", choices=["export", "import"])
+    parser.add_argument("directory", type=Path, help="Directory holding one <collection>.ndjson.gz per collection")
+    parser.add_argument("--collections", nargs="+", help="Limit to these collections (default: all)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run(args.mode, args.directory, args.collections))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Date handling for documents stored in MongoDB.
+
+Calendar days (`scheduled_date`, `date`) are stored as BSON dates at UTC
+midnight and timestamps (`created_at`, `expires_at`) as timezone-aware BSON
+dates. The API keeps exchanging calendar days as "YYYY-MM-DD" strings: the
+strict `DateKey` type validates them on the way in and the lenient
+`StoredDateKey` converts stored values back on the way out.
+
+Documents written before the migration still hold ISO strings. Until
+`migrate_dates.py` has finished, lookups go through `date_key_match` and
+`date_key_range`, which match both representations.
+"""
+import logging
+from datetime import date, datetime, time, timezone
+from typing import Annotated, Optional, Union
+
+from pydantic import BeforeValidator
+
+DATE_KEY_FORMAT = "%Y-%m-%d"
+
+logger = logging.getLogger(__name__)
+
+DATE_KEY = "date_key"
+TIMESTAMP = "timestamp"
+
+# Date-typed fields per collection, used by the migration and by imports
+DATE_FIELDS = {
+    "users": {"created_at": TIMESTAMP},
+    "amals": {"scheduled_date": DATE_KEY, "created_at": TIMESTAMP},
+    "daily_notes": {"date": DATE_KEY, "created_at": TIMESTAMP},
+    "prayer_tracks": {"date": DATE_KEY},
+    "password_resets": {"created_at": TIMESTAMP, "expires_at": TIMESTAMP},
+}
+
+def to_date_key(value: Union[str, date, datetime, None]) -> Optional[datetime]:
+    """Convert a "YYYY-MM-DD" string (or date) to the UTC-midnight datetime stored in Mongo."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = datetime.strptime(value, DATE_KEY_FORMAT).date()
+    elif not isinstance(value, date):
+        raise ValueError(f"expected a YYYY-MM-DD date, got {type(value).__name__}")
+    return datetime.combine(value, time.min, tzinfo=timezone.utc)
+
+def from_date_key(value: Union[str, date, datetime, None]) -> Optional[str]:
+    """Convert a stored calendar day back to "YYYY-MM-DD", validating strings on the way."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime(DATE_KEY_FORMAT)
+    if not isinstance(value, str):
+        raise ValueError(f"expected a YYYY-MM-DD date, got {type(value).__name__}")
+    return datetime.strptime(value, DATE_KEY_FORMAT).strftime(DATE_KEY_FORMAT)
+
+def to_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """Parse a legacy ISO timestamp string into an aware datetime (UTC if no offset)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif not isinstance(value, datetime):
+        raise ValueError(f"expected an ISO timestamp, got {type(value).__name__}")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def read_date_key(value) -> Optional[str]:
+    """Lenient `from_date_key` for stored values; anything unparseable is returned as text."""
+    try:
+        return from_date_key(value)
+    except ValueError:
+        if isinstance(value, str):
+            return value
+        logger.warning(f"Unreadable stored date {value!r}, returning it as text")
+        return str(value)
+
+# "YYYY-MM-DD" in the API, BSON date in Mongo. Request bodies and parameters use
+# the strict `DateKey`; response models use `StoredDateKey` so a legacy value the
+# migration could not convert never turns a read into a 500.
+DateKey = Annotated[str, BeforeValidator(from_date_key)]
+StoredDateKey = Annotated[str, BeforeValidator(read_date_key)]
+
+def date_key_match(value: str) -> dict:
+    """Equality filter on a calendar day that also matches not-yet-migrated string values."""
+    return {"$in": [to_date_key(value), from_date_key(value)]}
+
+def date_key_range(field: str, start: date, end: date) -> dict:
+    """Filter for `start <= field < end`, covering both BSON dates and legacy strings."""
+    return {"$or": [
+        {field: {"$gte": to_date_key(start), "$lt": to_date_key(end)}},
+        {field: {"$gte": start.strftime(DATE_KEY_FORMAT), "$lt": end.strftime(DATE_KEY_FORMAT)}},
+    ]}
+
+def convert_field(kind: str, value):
+    """Convert one stored value to its BSON date form according to its field kind."""
+    if kind == DATE_KEY:
+        return to_date_key(value)
+    return to_timestamp(value)
+
+def normalize_dates(collection: str, doc: dict) -> dict:
+    """Convert any string date fields of `doc` in place; used for imported documents."""
+    for field, kind in DATE_FIELDS.get(collection, {}).items():
+        if isinstance(doc.get(field), str):
+            doc[field] = convert_field(kind, doc[field])
+    return doc
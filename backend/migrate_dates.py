@@ -0,0 +1,143 @@
+"""Online migration of string dates to native BSON dates.
+
+Walks each collection in `_id` order, converting the fields listed in
+`dates.DATE_FIELDS` batch by batch. Every update is guarded on the old value,
+so documents the API rewrites concurrently are left alone. Progress is
+checkpointed in the `migrations` collection after each batch, and a rerun
+resumes from the last checkpoint.
+
+Usage:
+    python migrate_dates.py [--collections amals daily_notes ...] [--batch-size 1000] [--pause 0.1] [--restart]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from dates import DATE_FIELDS, convert_field
+
+ROOT_DIR = Path(__file__).parent
+
+MIGRATION_NAME = "string-dates-to-bson"
+DEFAULT_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+def _pending_filter(fields: dict) -> dict:
+    return {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+def _build_update(doc: dict, fields: dict) -> Optional[UpdateOne]:
+    guard = {"_id": doc["_id"]}
+    changes = {}
+    for field, kind in fields.items():
+        value = doc.get(field)
+        if not isinstance(value, str):
+            continue
+        guard[field] = value
+        changes[field] = convert_field(kind, value)
+    return UpdateOne(guard, {"$set": changes}) if changes else None
+
+async def migrate_collection(db, collection: str, batch_size: int, pause: float, restart: bool):
+    """Convert one collection, resuming from its checkpoint unless `restart` is set."""
+    fields = DATE_FIELDS[collection]
+    checkpoint_id = f"{MIGRATION_NAME}:{collection}"
+    checkpoint = None if restart else await db.migrations.find_one({"_id": checkpoint_id})
+    if checkpoint and checkpoint.get("done"):
+        logger.info(f"{collection}: already migrated, skipping")
+        return
+
+    last_id = checkpoint.get("last_id") if checkpoint else None
+    migrated = checkpoint.get("migrated", 0) if checkpoint else 0
+    failed = checkpoint.get("failed", 0) if checkpoint else 0
+    pending = await db[collection].count_documents(_pending_filter(fields))
+    logger.info(f"{collection}: {pending} documents pending" + (f", resuming after _id {last_id}" if last_id else ""))
+
+    started = time.perf_counter()
+    processed = 0
+    while True:
+        query = _pending_filter(fields)
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        projection = {field: 1 for field in fields}
+        batch = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            try:
+                operation = _build_update(doc, fields)
+            except ValueError as e:
+                # Leave unparseable values as they are and report them
+                failed += 1
+                logger.warning(f"{collection}: cannot convert _id {doc['_id']}: {e}")
+                continue
+            if operation:
+                operations.append(operation)
+
+        if operations:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+
+        processed += len(batch)
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {
+                "last_id": last_id,
+                "migrated": migrated,
+                "failed": failed,
+                "updated_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        percent = min(processed / pending * 100, 100) if pending else 100
+        logger.info(f"{collection}: {processed}/{pending} ({percent:.1f}%), {processed / elapsed:.0f} docs/s")
+
+        if pause:
+            # Throttle so the migration doesn't starve live traffic
+            await asyncio.sleep(pause)
+
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"done": True, "migrated": migrated, "failed": failed, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    logger.info(f"{collection}: done, {migrated} migrated, {failed} failed")
+
+async def run(collections: List[str], batch_size: int, pause: float, restart: bool):
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ.get('DB_NAME', 'bedahni_db')]
+    try:
+        for collection in collections:
+            await migrate_collection(db, collection, batch_size, pause, restart)
+    finally:
+        client.close()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert ISO string dates to BSON dates in batches.")
+    parser.add_argument("--collections", nargs="+", choices=sorted(DATE_FIELDS), default=list(DATE_FIELDS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved checkpoints and start over")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run(args.collections, args.batch_size, args.pause, args.restart))
+
+if __name__ == "__main__":
+    main()
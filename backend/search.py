@@ -0,0 +1,227 @@
+"""Indonesian-aware tokenisation, stemming and ranking for `/api/search`.
+
+MongoDB text indexes have no Indonesian stemmer, so each searchable document
+carries its own `search_terms` array of stems. A multikey index on
+(user_id, search_terms) turns it into a per-user inverted index: a query
+fetches only the documents sharing a stem with it, and those are ranked here
+with BM25. Handlers recompute `search_terms` whenever the text changes.
+
+Ranking only reads `id` and `search_terms`; full documents are loaded for the
+requested page alone. BM25 needs the size of the user's corpus and its
+average document length; both come from running totals in `search_stats`
+(`docs` and `terms`) rather than being counted per request.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from search_lexicon import ROOT_WORDS
+
+# Text fields indexed per collection
+SEARCH_FIELDS = {
+    "amals": ["name", "notes"],
+    "daily_notes": ["notes", "reflections"],
+}
+SEARCH_RESULT_TYPES = {"amals": "amal", "daily_notes": "daily_note"}
+
+STOPWORDS = frozenset("""
+    ada adalah agar akan aku al apa atau bagaimana bagi bahwa bisa dalam dan
+    dari dengan di dia hal hanya ia ini itu jika juga kami karena ke kepada kita
+    lagi lebih maka masih mereka namun nya oleh pada para pun saja sangat saya
+    sebagai sebelum sedang sekali selalu semua sering seperti setelah sudah
+    telah tetapi tidak untuk yang
+""".split())
+
+MIN_STEM_LENGTH = 3
+MAX_PREFIXES = 3
+
+PARTICLES = ("lah", "pun")
+POSSESSIVES = ("nya", "ku", "mu")
+DERIVATIONAL = ("i", "kan", "an")
+
+PLAIN_PREFIXES = ("memper", "ber", "per", "ter", "di", "ke", "se")
+VOWELS = frozenset("aeiou")
+CONSONANTS = frozenset("bcdfghjklmnpqrstvwxyz")
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+def _strip_suffix(word: str, suffixes: Iterable[str]) -> str:
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+def _prefix_variants(word: str) -> List[str]:
+    """Every word obtainable by removing one prefix, including nasal recodings."""
+    variants = []
+    for prefix in PLAIN_PREFIXES:
+        if word.startswith(prefix):
+            variants.append(word[len(prefix):])
+    for prefix in ("be", "te"):
+        # be-kerja, te-rasa: the r of ber-/ter- is dropped before "er" and "r"
+        rest = word[2:]
+        if word.startswith(prefix) and (rest[:1] == "r" or (rest[:1] in CONSONANTS and rest[1:3] == "er")):
+            variants.append(rest)
+    for prefix in ("bel", "pel"):
+        if word.startswith(prefix + "ajar"):
+            variants.append(word[3:])
+    for me in ("me", "pe"):
+        if not word.startswith(me):
+            continue
+        rest = word[2:]
+        if rest[:1] in ("l", "r", "w", "y"):
+            variants.append(rest)
+        elif rest.startswith("ny") and rest[2:3] in VOWELS:
+            variants.append("s" + rest[2:])
+        elif rest.startswith("ng"):
+            rest = rest[2:]
+            if rest[:1] in VOWELS:
+                variants.extend([rest, "k" + rest])
+            elif rest[:1] in ("g", "h", "k", "q"):
+                variants.append(rest)
+        elif rest.startswith("m"):
+            rest = rest[1:]
+            if rest[:1] in VOWELS:
+                variants.extend(["p" + rest, "m" + rest])
+            elif rest[:1] in ("b", "f", "v"):
+                variants.append(rest)
+        elif rest.startswith("n"):
+            rest = rest[1:]
+            if rest[:1] in VOWELS:
+                variants.extend(["t" + rest, "n" + rest])
+            elif rest[:1] in ("c", "d", "j", "z"):
+                variants.append(rest)
+    return [variant for variant in variants if len(variant) >= MIN_STEM_LENGTH]
+
+def _prefix_closure(word: str) -> List[str]:
+    """`word` followed by everything reachable by removing up to MAX_PREFIXES prefixes, fewest first."""
+    seen = [word]
+    frontier = [word]
+    for _ in range(MAX_PREFIXES):
+        frontier = [variant for candidate in frontier for variant in _prefix_variants(candidate) if variant not in seen]
+        seen.extend(frontier)
+    return seen
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Dictionary-guided Indonesian stemmer after Nazief-Adriani.
+
+    Inflectional suffixes are always removed. Derivational suffixes and
+    prefixes are only removed when that yields a word from the root lexicon;
+    otherwise the word is kept as is, so unknown roots are never cut short.
+    """
+    if len(word) <= MIN_STEM_LENGTH or not word.isalpha() or word in ROOT_WORDS:
+        return word
+    for suffixes in (PARTICLES, POSSESSIVES):
+        word = _strip_suffix(word, suffixes)
+        if word in ROOT_WORDS:
+            return word
+
+    bases = [word[:-len(suffix)] for suffix in DERIVATIONAL
+             if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH]
+    for base in bases + [word]:
+        for candidate in _prefix_closure(base):
+            if candidate in ROOT_WORDS:
+                return candidate
+    return word
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, split on non-word characters and drop stopwords."""
+    if not text:
+        return []
+    # Join elided words such as qur'an before splitting
+    text = text.lower().replace("'", "").replace("\u2019", "")
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS and len(token) > 1]
+
+def analyze(text: Optional[str]) -> List[str]:
+    """Tokenise and stem `text`, keeping duplicates so term frequency survives."""
+    return [stem(token) for token in tokenize(text)]
+
+def search_terms_for(collection: str, doc: dict) -> List[str]:
+    """Build the `search_terms` array stored on a document of `collection`."""
+    terms = []
+    for field in SEARCH_FIELDS[collection]:
+        terms.extend(analyze(doc.get(field)))
+    return terms
+
+def query_terms(query: str) -> List[str]:
+    """Distinct stems of a search query, in order of appearance."""
+    return list(dict.fromkeys(analyze(query)))
+
+def rank(terms: List[str], candidates: List[dict], total_docs: int, total_terms: int = 0) -> List[Tuple[float, dict]]:
+    """Score candidates by BM25 over their `search_terms`, best match first.
+
+    `candidates` must be every document containing at least one of `terms`,
+    which makes the document frequencies exact. `total_docs` and
+    `total_terms` describe the user's whole searchable corpus; without a
+    term total the average length falls back to that of the candidates.
+    """
+    if not candidates:
+        return []
+    counts: List[Counter] = [Counter(doc.get("search_terms") or []) for doc in candidates]
+    lengths = [sum(count.values()) for count in counts]
+    total_docs = max(total_docs, len(candidates))
+    if total_terms > 0:
+        average_length = total_terms / total_docs
+    else:
+        average_length = (sum(lengths) / len(lengths)) or 1.0
+
+    idf: Dict[str, float] = {}
+    for term in terms:
+        frequency = sum(1 for count in counts if term in count)
+        idf[term] = math.log(1 + (total_docs - frequency + 0.5) / (frequency + 0.5))
+
+    scored = []
+    for doc, count, length in zip(candidates, counts, lengths):
+        score = 0.0
+        for term in terms:
+            tf = count.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+        scored.append((score, doc))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored
+
+async def find_matches(db, user_id: str, terms: List[str], page: int, limit: int) -> Tuple[int, List[Tuple[float, str, dict]]]:
+    """Rank the user's documents matching `terms` and load one page of them.
+
+    Returns the total number of matches and `(score, collection, document)`
+    for the requested page.
+    """
+    candidates = []
+    for collection in SEARCH_FIELDS:
+        cursor = db[collection].find(
+            {"user_id": user_id, "search_terms": {"$in": terms}},
+            {"_id": 0, "id": 1, "search_terms": 1}
+        )
+        async for doc in cursor:
+            doc["collection"] = collection
+            candidates.append(doc)
+
+    stats = await db.search_stats.find_one({"_id": user_id}) or {}
+    ranked = rank(terms, candidates, stats.get("docs", 0), stats.get("terms", 0))
+    start = (page - 1) * limit
+    hits = ranked[start:start + limit]
+
+    ids = defaultdict(list)
+    for _, doc in hits:
+        ids[doc["collection"]].append(doc["id"])
+    loaded = {}
+    for collection, collection_ids in ids.items():
+        cursor = db[collection].find({"user_id": user_id, "id": {"$in": collection_ids}}, {"_id": 0, "search_terms": 0})
+        async for doc in cursor:
+            loaded[collection, doc["id"]] = doc
+
+    # A document deleted between ranking and loading is simply left out
+    results = [
+        (score, doc["collection"], loaded[doc["collection"], doc["id"]])
+        for score, doc in hits
+        if (doc["collection"], doc["id"]) in loaded
+    ]
+    return len(ranked), results
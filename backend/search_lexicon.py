@@ -0,0 +1,74 @@
+"""Root-word lexicon for the Indonesian stemmer in search.py.
+
+Derivational affixes are only removed when what remains is listed here
+(Nazief-Adriani), so the list favours vocabulary that shows up in daily
+notes, reflections and amal names: worship, daily routine, family,
+feelings and common verbs.
+"""
+
+ROOT_WORDS = frozenset("""
+    adab adil adzan ajak ajar akhir akhirat alhamdulillah allah alquran amal
+    amalan amanah ambil ampun anak arah arti asar ashar astaghfirullah awal ayah
+    ayat azan
+
+    baca badan baik bangun bantu banyak bapak baru batas bawa bebas beda belanja
+    benar berat beri berkah bersih besar bicara bimbing bismillah buat buka butuh
+    bukti bulan buruk
+
+    cahaya capai capek catat cepat cerita ceramah cinta coba cuci
+
+    dahulu damai dapat datang dekat dengar diam didik diri doa dosa duduk duha
+    dhuha dunia dzikir dzuhur
+
+    fajar fikir fitnah fitri
+
+    gagal ganti ghibah guru
+
+    hadir hadis hadits hafal haji halal hamba harap hari harta haram hasil hati
+    hemat henti hidayah hidup hikmah hilang hitung hormat hutang
+
+    ibadah ibu idul ikhlas ikut ilmu imam iman infak infaq ingat insyaallah
+    iqamah isi istiqomah istirahat istri isya izin
+
+    jadi jaga jalan jamaah janji jawab jiwa jujur juz
+
+    kabar kaji kalah kantor karunia kasih kata kecil keluar keluarga kembali
+    kenal kerja khatam khusyuk khutbah kirim kisah kitab kuat kumpul kurang
+    kurban
+
+    lahir lalai lama lambat lanjut lapang lapar latih layan lebaran lelah lemah
+    lengkap lihat lindung lisan lupa
+
+    maaf magrib maghrib makan makna malam malas malu mandi marah masak masjid
+    masuk masyaallah mati minta minum mohon mudah mulai mulia murah musholla
+    mushola
+
+    nafsu naik nasihat nikmat niat nilai
+
+    obat olahraga orang
+
+    pagi pahala paham pakai pasti pelihara penuh percaya pergi perintah
+    pesan pikir pilih pimpin pindah puasa puji pulang
+
+    qiyam quran qurban
+
+    rahmat rajin ramadan ramadhan rapi rasa rawat rencana renung rezeki ridha
+    ridho rindu rizki ruku rukuk rumah rutin
+
+    sabar sahabat sakit salah salam sampai sapa sayang sedekah sedih segar sehat
+    sekolah selamat selesai semangat sempat senang senyum sesal shalat sholat
+    siang siap sibuk simpan solat sore subhanallah subuh suci sujud sulit suami
+    sunnah surah surat surga susah syukur
+
+    tafsir tahajud tahan tahu tahun takbir takut taqwa takwa tanya tarawih
+    taubat tawa teman tenang tepat terang terima terus tetangga tetap tiba tidur
+    tilawah tinggal tobat tolong tua tuju tulis tulus tunda tunggu tunjuk turun
+
+    ubah ucap ujian ulang umrah umroh undang untung usaha ustad ustadz ustadzah
+
+    waktu wajib wajah witir wudhu wudu
+
+    yakin
+
+    zakat zikir zuhur
+""".split())
@@ -1,11 +1,13 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
@@ -15,13 +17,34 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import httpx
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from data_transfer import (
+    USER_COLLECTIONS,
+    BatchWriter,
+    ImportFormatError,
+    gzip_stream,
+    iter_cursor_lines,
+    iter_ndjson,
+    iter_upload_chunks,
+)
+from dates import (
+    DateKey,
+    StoredDateKey,
+    date_key_match,
+    date_key_range,
+    normalize_dates,
+    to_date_key,
+    to_timestamp,
+)
+from search import SEARCH_FIELDS, SEARCH_RESULT_TYPES, find_matches, query_terms, search_terms_for
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ.get('DB_NAME', 'bedahni_db')]
 
 # JWT Configuration
@@ -157,7 +180,7 @@ class ResetPasswordRequest(BaseModel):
 class AmalCreate(BaseModel):
     name: str
     notes: Optional[str] = None
-    scheduled_date: Optional[str] = None
+    scheduled_date: Optional[DateKey] = None
     scheduled_time: Optional[str] = None
     repeat_daily: bool = False
 
@@ -167,7 +190,7 @@ class Amal(BaseModel):
     user_id: str
     name: str
     notes: Optional[str] = None
-    scheduled_date: Optional[str] = None
+    scheduled_date: Optional[StoredDateKey] = None
     scheduled_time: Optional[str] = None
     repeat_daily: bool = False
     completed: bool = False
@@ -176,14 +199,14 @@ class Amal(BaseModel):
 class AmalUpdate(BaseModel):
     name: Optional[str] = None
     notes: Optional[str] = None
-    scheduled_date: Optional[str] = None
+    scheduled_date: Optional[DateKey] = None
     scheduled_time: Optional[str] = None
     repeat_daily: Optional[bool] = None
     completed: Optional[bool] = None
 
 # Daily Note Model
 class DailyNoteCreate(BaseModel):
-    date: str  # YYYY-MM-DD
+    date: DateKey  # YYYY-MM-DD
     notes: Optional[str] = None
     reflections: Optional[str] = None
 
@@ -191,14 +214,14 @@ class DailyNote(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    date: str
+    date: StoredDateKey
     notes: Optional[str] = None
     reflections: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 # Prayer Tracking
 class PrayerTrackCreate(BaseModel):
-    date: str  # YYYY-MM-DD
+    date: DateKey  # YYYY-MM-DD
     subuh: bool = False
     dzuhur: bool = False
     ashar: bool = False
@@ -209,7 +232,7 @@ class PrayerTrack(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    date: str
+    date: StoredDateKey
     subuh: bool = False
     dzuhur: bool = False
     ashar: bool = False
@@ -277,7 +300,7 @@ async def register(user_data: UserCreate):
         "address": None,
         "city": None,
         "country": "Indonesia",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
     # Insert without getting the result with _id
@@ -335,8 +358,8 @@ async def forgot_password(request: ForgotPasswordRequest):
         {
             "$set": {
                 "code": reset_code, 
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "expires_at": (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat()
+                "created_at": datetime.now(timezone.utc),
+                "expires_at": datetime.now(timezone.utc) + timedelta(minutes=15)
             }
         },
         upsert=True
@@ -370,8 +393,7 @@ async def reset_password(request: ResetPasswordRequest):
     
     # Check if code expired
     if reset_record.get("expires_at"):
-        expires_at = datetime.fromisoformat(reset_record["expires_at"].replace("Z", "+00:00"))
-        if datetime.now(timezone.utc) > expires_at:
+        if datetime.now(timezone.utc) > to_timestamp(reset_record["expires_at"]):
             await db.password_resets.delete_one({"email": request.email})
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -542,23 +564,26 @@ async def create_amal(amal_data: AmalCreate, current_user: dict = Depends(get_cu
         "id": str(uuid.uuid4()),
         "user_id": current_user["id"],
         **amal_data.model_dump(),
+        "scheduled_date": to_date_key(amal_data.scheduled_date),
         "completed": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc),
+        "search_terms": search_terms_for("amals", amal_data.model_dump())
     }
     
     await db.amals.insert_one(amal_dict)
+    await _update_search_stats(current_user["id"], docs=1, terms=len(amal_dict["search_terms"]))
     return Amal(**amal_dict)
 
 @api_router.get("/amal", response_model=List[Amal])
 async def get_amals(
-    date: Optional[str] = None,
+    date: Optional[DateKey] = None,
     current_user: dict = Depends(get_current_user)
 ):
     query = {"user_id": current_user["id"]}
     if date:
-        query["scheduled_date"] = date
+        query["scheduled_date"] = date_key_match(date)
     
-    amals = await db.amals.find(query, {"_id": 0}).to_list(100)
+    amals = await db.amals.find(query, {"_id": 0, "search_terms": 0}).to_list(100)
     return amals
 
 @api_router.put("/amal/{amal_id}", response_model=Amal)
@@ -568,17 +593,31 @@ async def update_amal(
     current_user: dict = Depends(get_current_user)
 ):
     update_data = {k: v for k, v in amal_update.model_dump().items() if v is not None}
-    
-    if update_data:
-        await db.amals.update_one(
-            {"id": amal_id, "user_id": current_user["id"]},
-            {"$set": update_data}
+    if "scheduled_date" in update_data:
+        update_data["scheduled_date"] = to_date_key(update_data["scheduled_date"])
+    query = {"id": amal_id, "user_id": current_user["id"]}
+    
+    if update_data.keys() & set(SEARCH_FIELDS["amals"]):
+        # Index the merged text in the same write, guarded on the text it was
+        # built from so a concurrent edit can't leave search_terms stale
+        for _ in range(3):
+            existing = await db.amals.find_one(query, {"_id": 0})
+            if not existing:
+                raise HTTPException(status_code=404, detail="Amal not found")
+            guard = {**query, **{field: existing.get(field) for field in SEARCH_FIELDS["amals"]}}
+            search_terms = search_terms_for("amals", {**existing, **update_data})
+            result = await db.amals.update_one(guard, {"$set": {**update_data, "search_terms": search_terms}})
+            if result.matched_count:
+                break
+        else:
+            raise HTTPException(status_code=409, detail="Amal was modified concurrently, please retry")
+        await _update_search_stats(
+            current_user["id"], terms=len(search_terms) - len(existing.get("search_terms") or [])
         )
+    elif update_data:
+        await db.amals.update_one(query, {"$set": update_data})
     
-    updated_amal = await db.amals.find_one(
-        {"id": amal_id, "user_id": current_user["id"]},
-        {"_id": 0}
-    )
+    updated_amal = await db.amals.find_one(query, {"_id": 0})
     
     if not updated_amal:
         raise HTTPException(status_code=404, detail="Amal not found")
@@ -587,9 +626,13 @@ async def update_amal(
 
 @api_router.delete("/amal/{amal_id}")
 async def delete_amal(amal_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.amals.delete_one({"id": amal_id, "user_id": current_user["id"]})
-    if result.deleted_count == 0:
+    deleted = await db.amals.find_one_and_delete(
+        {"id": amal_id, "user_id": current_user["id"]},
+        {"_id": 0, "search_terms": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Amal not found")
+    await _update_search_stats(current_user["id"], docs=-1, terms=-len(deleted.get("search_terms") or []))
     return {"message": "Amal deleted successfully"}
 
 # ==================== DAILY NOTES ROUTES ====================
@@ -601,30 +644,41 @@ async def create_or_update_daily_note(
 ):
     existing = await db.daily_notes.find_one({
         "user_id": current_user["id"],
-        "date": note_data.date
+        "date": date_key_match(note_data.date)
     })
     
+    search_terms = search_terms_for("daily_notes", note_data.model_dump())
     if existing:
         await db.daily_notes.update_one(
-            {"id": existing["id"]},
-            {"$set": note_data.model_dump()}
+            {"id": existing["id"], "user_id": current_user["id"]},
+            {"$set": {
+                **note_data.model_dump(),
+                "date": to_date_key(note_data.date),
+                "search_terms": search_terms
+            }}
+        )
+        await _update_search_stats(
+            current_user["id"], terms=len(search_terms) - len(existing.get("search_terms") or [])
         )
-        updated = await db.daily_notes.find_one({"id": existing["id"]}, {"_id": 0})
+        updated = await db.daily_notes.find_one({"id": existing["id"], "user_id": current_user["id"]}, {"_id": 0})
         return DailyNote(**updated)
     else:
         note_dict = {
             "id": str(uuid.uuid4()),
             "user_id": current_user["id"],
             **note_data.model_dump(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "date": to_date_key(note_data.date),
+            "created_at": datetime.now(timezone.utc),
+            "search_terms": search_terms
         }
         await db.daily_notes.insert_one(note_dict)
+        await _update_search_stats(current_user["id"], docs=1, terms=len(search_terms))
         return DailyNote(**note_dict)
 
 @api_router.get("/daily-notes/{date}", response_model=Optional[DailyNote])
-async def get_daily_note(date: str, current_user: dict = Depends(get_current_user)):
+async def get_daily_note(date: DateKey, current_user: dict = Depends(get_current_user)):
     note = await db.daily_notes.find_one(
-        {"user_id": current_user["id"], "date": date},
+        {"user_id": current_user["id"], "date": date_key_match(date)},
         {"_id": 0}
     )
     return DailyNote(**note) if note else None
@@ -638,29 +692,30 @@ async def create_or_update_prayer_track(
 ):
     existing = await db.prayer_tracks.find_one({
         "user_id": current_user["id"],
-        "date": track_data.date
+        "date": date_key_match(track_data.date)
     })
     
     if existing:
         await db.prayer_tracks.update_one(
-            {"id": existing["id"]},
-            {"$set": track_data.model_dump()}
+            {"id": existing["id"], "user_id": current_user["id"]},
+            {"$set": {**track_data.model_dump(), "date": to_date_key(track_data.date)}}
         )
-        updated = await db.prayer_tracks.find_one({"id": existing["id"]}, {"_id": 0})
+        updated = await db.prayer_tracks.find_one({"id": existing["id"], "user_id": current_user["id"]}, {"_id": 0})
         return PrayerTrack(**updated)
     else:
         track_dict = {
             "id": str(uuid.uuid4()),
             "user_id": current_user["id"],
-            **track_data.model_dump()
+            **track_data.model_dump(),
+            "date": to_date_key(track_data.date)
         }
         await db.prayer_tracks.insert_one(track_dict)
         return PrayerTrack(**track_dict)
 
 @api_router.get("/prayer-track/{date}", response_model=Optional[PrayerTrack])
-async def get_prayer_track(date: str, current_user: dict = Depends(get_current_user)):
+async def get_prayer_track(date: DateKey, current_user: dict = Depends(get_current_user)):
     track = await db.prayer_tracks.find_one(
-        {"user_id": current_user["id"], "date": date},
+        {"user_id": current_user["id"], "date": date_key_match(date)},
         {"_id": 0}
     )
     return PrayerTrack(**track) if track else None
@@ -668,13 +723,13 @@ async def get_prayer_track(date: str, current_user: dict = Depends(get_current_u
 @api_router.get("/prayer-track/stats/weekly")
 async def get_weekly_prayer_stats(current_user: dict = Depends(get_current_user)):
     """Get prayer completion stats for the last 7 days."""
-    today = datetime.now()
-    dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
+    today = datetime.now().date()
     
     tracks = await db.prayer_tracks.find(
-        {"user_id": current_user["id"], "date": {"$in": dates}},
+        {"user_id": current_user["id"], **date_key_range("date", today - timedelta(days=6), today + timedelta(days=1))},
         {"_id": 0}
     ).to_list(7)
+    tracks = [PrayerTrack(**track).model_dump() for track in tracks]
     
     total_prayers = 0
     completed_prayers = 0
@@ -692,6 +747,206 @@ async def get_weekly_prayer_stats(current_user: dict = Depends(get_current_user)
         "tracks": tracks
     }
 
+# ==================== DATA EXPORT/IMPORT ROUTES ====================
+
+async def _user_history_lines(user_id: str):
+    for collection in USER_COLLECTIONS:
+        cursor = db[collection].find({"user_id": user_id}, {"_id": 0, "search_terms": 0, "source_id": 0})
+        async for line in iter_cursor_lines(cursor, lambda doc: {"collection": collection, "document": doc}):
+            yield line
+
+@api_router.get("/export")
+async def export_user_data(current_user: dict = Depends(get_current_user)):
+    """Stream the user's amals, daily notes and prayer tracks as gzip-compressed NDJSON."""
+    filename = f"ibadahku-export-{datetime.now(timezone.utc).strftime('%Y%m%d')}.ndjson.gz"
+    return StreamingResponse(
+        gzip_stream(_user_history_lines(current_user["id"])),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# (input model with strict dates, stored model) per collection
+IMPORT_MODELS = {
+    "amals": (AmalCreate, Amal),
+    "daily_notes": (DailyNoteCreate, DailyNote),
+    "prayer_tracks": (PrayerTrackCreate, PrayerTrack),
+}
+
+def _validate_import(collection: str, user_id: str, document: dict, line_number: int) -> dict:
+    """Check an imported document against its models and return the fields to store."""
+    create_model, model = IMPORT_MODELS[collection]
+    try:
+        create_model(**document)
+        validated = model(**{**document, "user_id": user_id}).model_dump()
+        normalize_dates(collection, validated)
+    except (ValidationError, ValueError) as e:
+        raise ImportFormatError(line_number, f"invalid {collection} document: {e}")
+    if collection in SEARCH_FIELDS:
+        validated["search_terms"] = search_terms_for(collection, validated)
+    return validated
+
+def _import_operation(collection: str, user_id: str, document: dict) -> UpdateOne:
+    # Daily notes and prayer tracks are unique per day. Amals are matched on the id
+    # from the file: either a row this user already owns under that id, or one an
+    # earlier import created from it (`source_id`). New rows get a fresh id so a
+    # dump from another account never shares ids with it, and importing the same
+    # dump again updates those rows instead of duplicating them.
+    fields = {k: v for k, v in document.items() if k != "id"}
+    if collection == "amals":
+        fields["source_id"] = document["id"]
+        filter_ = {"user_id": user_id, "$or": [{"id": document["id"]}, {"source_id": document["id"]}]}
+    else:
+        filter_ = {"user_id": user_id, "date": date_key_match(document["date"])}
+    return UpdateOne(
+        filter_,
+        {"$set": fields, "$setOnInsert": {"id": str(uuid.uuid4())}},
+        upsert=True
+    )
+
+async def _iter_import(file: UploadFile, user_id: str):
+    """Yield `(line_number, collection, key, document)` for every entry of an upload, validated.
+
+    `key` identifies the row the entry lands on, or is None when it always
+    creates a new one (an amal without an id).
+    """
+    await file.seek(0)
+    async for line_number, entry in iter_ndjson(iter_upload_chunks(file.read)):
+        collection = entry.get("collection")
+        document = entry.get("document")
+        if collection not in IMPORT_MODELS or not isinstance(document, dict):
+            raise ImportFormatError(line_number, "expected {\"collection\": ..., \"document\": {...}}")
+
+        if collection == "amals":
+            key = (collection, document["id"]) if document.get("id") is not None else None
+        document = _validate_import(collection, user_id, document, line_number)
+        if collection != "amals":
+            key = (collection, document["date"])
+        yield line_number, collection, key, document
+
+@api_router.post("/import")
+async def import_user_data(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Restore history from an `/export` dump (gzip or plain NDJSON), upserting in batches.
+
+    The whole file is validated before anything is written, so a bad line
+    leaves the account untouched. The upload is spooled to disk, so the
+    write pass reads it again instead of holding the documents in memory.
+    """
+    user_id = current_user["id"]
+    writers = {collection: BatchWriter(db[collection]) for collection in USER_COLLECTIONS}
+
+    try:
+        # Repeated rows within one file: the last occurrence wins
+        last_line = {}
+        async for line_number, _, key, _ in _iter_import(file, user_id):
+            if key is not None:
+                last_line[key] = line_number
+
+        async for line_number, collection, key, document in _iter_import(file, user_id):
+            if key is None or last_line[key] == line_number:
+                await writers[collection].add(_import_operation(collection, user_id, document))
+
+        for writer in writers.values():
+            await writer.flush()
+    except ImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid import file: {e}")
+    except BulkWriteError as e:
+        logger.error(f"Bulk write failed during import for user {user_id}: {e.details}")
+        raise HTTPException(status_code=500, detail="Import failed while writing data")
+
+    if any(writers[collection].written for collection in SEARCH_FIELDS):
+        # Upserts replace terms of unknown length, so recount rather than increment
+        await _recount_search_stats(user_id)
+    imported = {collection: writer.written for collection, writer in writers.items()}
+    logger.info(f"Imported history for user {user_id}: {imported}")
+    return {"message": "Import completed successfully", "imported": imported}
+
+# ==================== SEARCH ROUTES ====================
+
+# Bump the version whenever the analyser or `search_stats` changes so both get rebuilt
+SEARCH_BACKFILL_ID = "search-index:v3"
+
+# Per-user document count and total term count of a searchable collection
+SEARCH_STATS_GROUP = {"$group": {
+    "_id": "$user_id",
+    "docs": {"$sum": 1},
+    "terms": {"$sum": {"$size": {"$ifNull": ["$search_terms", []]}}},
+}}
+
+async def _update_search_stats(user_id: str, docs: int = 0, terms: int = 0):
+    """Keep the per-user corpus size and term total used by BM25 in step with writes."""
+    changes = {field: delta for field, delta in (("docs", docs), ("terms", terms)) if delta}
+    if changes:
+        await db.search_stats.update_one({"_id": user_id}, {"$inc": changes}, upsert=True)
+
+async def _recount_search_stats(user_id: str):
+    """Recompute a user's `search_stats` from their documents."""
+    stats = {"docs": 0, "terms": 0}
+    for collection in SEARCH_FIELDS:
+        async for row in db[collection].aggregate([{"$match": {"user_id": user_id}}, SEARCH_STATS_GROUP]):
+            stats["docs"] += row["docs"]
+            stats["terms"] += row["terms"]
+    await db.search_stats.update_one({"_id": user_id}, {"$set": stats}, upsert=True)
+
+async def backfill_search_index():
+    """One-off job per analyser version: (re)index every searchable document and seed `search_stats`."""
+    marker = await db.migrations.find_one({"_id": SEARCH_BACKFILL_ID})
+    if marker and marker.get("done"):
+        return
+
+    counts = {}
+    for collection in SEARCH_FIELDS:
+        writer = BatchWriter(db[collection])
+        fields = SEARCH_FIELDS[collection]
+        cursor = db[collection].find({}, {"_id": 1, **{field: 1 for field in fields}})
+        async for doc in cursor.batch_size(500):
+            # Guarded on the text read, so a concurrent edit's own terms are kept
+            await writer.add(UpdateOne(
+                {"_id": doc["_id"], **{field: doc.get(field) for field in fields}},
+                {"$set": {"search_terms": search_terms_for(collection, doc)}}
+            ))
+        await writer.flush()
+        logger.info(f"Search backfill indexed {writer.written} {collection}")
+
+        async for row in db[collection].aggregate([SEARCH_STATS_GROUP]):
+            stats = counts.setdefault(row["_id"], {"docs": 0, "terms": 0})
+            stats["docs"] += row["docs"]
+            stats["terms"] += row["terms"]
+
+    # Exact totals; increments racing with this only skew the scores slightly
+    writer = BatchWriter(db.search_stats)
+    for user_id, stats in counts.items():
+        await writer.add(UpdateOne({"_id": user_id}, {"$set": stats}, upsert=True))
+    await writer.flush()
+    await db.migrations.update_one(
+        {"_id": SEARCH_BACKFILL_ID},
+        {"$set": {"done": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+@api_router.get("/search")
+async def search_user_data(
+    q: str = Query(..., max_length=200),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Search the user's daily notes, reflections and amals, best match first."""
+    user_id = current_user["id"]
+    terms = query_terms(q)
+    if not terms:
+        return {"query": q, "total": 0, "page": page, "limit": limit, "results": []}
+
+    total, hits = await find_matches(db, user_id, terms, page, limit)
+    results = []
+    for score, collection, doc in hits:
+        item = Amal(**doc) if collection == "amals" else DailyNote(**doc)
+        results.append({"type": SEARCH_RESULT_TYPES[collection], "score": round(score, 4), **item.model_dump()})
+
+    return {"query": q, "total": total, "page": page, "limit": limit, "results": results}
+
 # ==================== ROOT ROUTES ====================
 
 @api_router.get("/")
@@ -713,6 +968,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    # Range scans on calendar days, plus TTL expiry of reset codes (requires BSON dates)
+    await db.amals.create_index([("user_id", 1), ("scheduled_date", 1)])
+    await db.daily_notes.create_index([("user_id", 1), ("date", 1)])
+    await db.amals.create_index([("user_id", 1), ("search_terms", 1)])
+    await db.daily_notes.create_index([("user_id", 1), ("search_terms", 1)])
+    await db.prayer_tracks.create_index([("user_id", 1), ("date", 1)])
+    # Amal lookups by id, and re-imports matching the id an amal was imported from
+    await db.amals.create_index([("user_id", 1), ("id", 1)])
+    await db.amals.create_index([("user_id", 1), ("source_id", 1)], sparse=True)
+    await db.password_resets.create_index("expires_at", expireAfterSeconds=0)
+
+async def _run_search_backfill():
+    try:
+        await backfill_search_index()
+    except Exception as e:
+        logger.error(f"Search index backfill failed: {e}")
+
+@app.on_event("startup")
+async def start_search_backfill():
+    # Runs in the background so startup isn't blocked on large collections
+    app.state.search_backfill = asyncio.create_task(_run_search_backfill())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
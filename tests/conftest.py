@@ -0,0 +1,45 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is run as a flat directory of modules (uvicorn server:app), not a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py only needs a URL to import; Motor connects lazily and API tests swap in mongomock
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An in-memory Motor database patched into server.py."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    database = AsyncMongoMockClient()["ibadahku_test"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+@pytest.fixture
+def current_user():
+    """The user requests are authenticated as; tests may change its id."""
+    return {"id": "user-a", "email": "a@example.com", "name": "User A"}
+
+
+@pytest.fixture
+def api(db, current_user):
+    """A TestClient authenticated as `current_user`.
+
+    Startup events (index creation, search backfill) are not run, since the
+    client is not used as a context manager.
+    """
+    from fastapi.testclient import TestClient
+
+    import server
+
+    server.app.dependency_overrides[server.get_current_user] = lambda: current_user
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
@@ -0,0 +1,80 @@
+import asyncio
+import gzip
+
+import pytest
+
+from data_transfer import ImportFormatError, encode_line, gzip_stream, iter_ndjson
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _chunks(data: bytes, size: int = 1000):
+    return _aiter([data[i:i + size] for i in range(0, len(data), size)])
+
+
+def _parse(data: bytes, **kwargs):
+    async def collect():
+        return [item async for item in iter_ndjson(_chunks(data), **kwargs)]
+    return asyncio.run(collect())
+
+
+def _compress(docs):
+    async def collect():
+        return b"".join([chunk async for chunk in gzip_stream(_aiter([encode_line(doc) for doc in docs]))])
+    return asyncio.run(collect())
+
+
+def test_gzip_round_trip():
+    docs = [{"i": i, "text": "x" * (i % 50)} for i in range(5000)]
+    payload = _compress(docs)
+
+    assert len(gzip.decompress(payload).splitlines()) == len(docs)
+    assert [doc for _, doc in _parse(payload)] == docs
+
+
+def test_plain_ndjson_passes_through():
+    assert _parse(b'{"a": 1}\n{"a": 2}') == [(1, {"a": 1}), (2, {"a": 2})]
+
+
+def test_line_numbers_count_blank_lines():
+    with pytest.raises(ImportFormatError) as excinfo:
+        _parse(b'{"a": 1}\n\n\nnot json\n')
+    assert excinfo.value.line_number == 4
+
+
+def test_non_object_line_is_rejected():
+    with pytest.raises(ImportFormatError, match="expected a JSON object"):
+        _parse(b'[1, 2]\n')
+
+
+def test_unterminated_line_is_bounded():
+    with pytest.raises(ImportFormatError, match="exceeds"):
+        _parse(b'{"a": "' + b"x" * 5000, max_line_size=1024)
+
+
+def test_long_terminated_line_is_rejected():
+    with pytest.raises(ImportFormatError, match="exceeds"):
+        _parse(b'{"a": 1}\n{"a": "' + b"x" * 2000 + b'"}\n', max_line_size=1024)
+
+
+def test_concatenated_gzip_members_are_all_read():
+    first = [{"i": i} for i in range(3)]
+    second = [{"i": i} for i in range(3, 5000)]
+    payload = _compress(first) + _compress(second)
+
+    assert [doc for _, doc in _parse(payload)] == first + second
+
+
+def test_truncated_gzip_is_rejected():
+    payload = _compress([{"i": i} for i in range(100)])
+
+    with pytest.raises(ImportFormatError, match="truncated"):
+        _parse(payload[:-10])
+
+
+def test_trailing_garbage_after_gzip_is_rejected():
+    with pytest.raises(ImportFormatError, match="invalid gzip"):
+        _parse(_compress([{"i": 1}]) + b"garbage")
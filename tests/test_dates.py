@@ -0,0 +1,71 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from pydantic import TypeAdapter, ValidationError
+
+from dates import (
+    DateKey,
+    StoredDateKey,
+    date_key_match,
+    date_key_range,
+    from_date_key,
+    normalize_dates,
+    to_date_key,
+    to_timestamp,
+)
+
+
+def test_to_date_key_is_utc_midnight():
+    assert to_date_key("2025-03-09") == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert to_date_key(date(2025, 3, 9)) == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert to_date_key(datetime(2025, 3, 9, 17, 30)) == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert to_date_key("") is None
+    assert to_date_key(None) is None
+
+
+@pytest.mark.parametrize("value", ["09-03-2025", "2025-02-30", 12345, ["2025-03-09"]])
+def test_to_date_key_rejects_invalid_values_with_value_error(value):
+    with pytest.raises(ValueError):
+        to_date_key(value)
+
+
+def test_from_date_key_round_trip():
+    assert from_date_key(to_date_key("2025-03-09")) == "2025-03-09"
+    assert from_date_key("2025-03-09") == "2025-03-09"
+    with pytest.raises(ValueError):
+        from_date_key(12345)
+
+
+def test_to_timestamp_parses_legacy_strings():
+    assert to_timestamp("2025-03-09T10:00:00Z") == datetime(2025, 3, 9, 10, tzinfo=timezone.utc)
+    assert to_timestamp("2025-03-09T10:00:00").tzinfo == timezone.utc
+    with pytest.raises(ValueError):
+        to_timestamp(12345)
+
+
+def test_date_key_match_covers_both_representations():
+    assert date_key_match("2025-03-09") == {"$in": [datetime(2025, 3, 9, tzinfo=timezone.utc), "2025-03-09"]}
+
+
+def test_date_key_range_is_half_open_over_both_representations():
+    query = date_key_range("date", date(2025, 3, 1), date(2025, 3, 8))
+    assert query == {"$or": [
+        {"date": {"$gte": datetime(2025, 3, 1, tzinfo=timezone.utc), "$lt": datetime(2025, 3, 8, tzinfo=timezone.utc)}},
+        {"date": {"$gte": "2025-03-01", "$lt": "2025-03-08"}},
+    ]}
+
+
+def test_normalize_dates_converts_only_string_fields():
+    doc = normalize_dates("amals", {"scheduled_date": "2025-03-09", "created_at": datetime(2025, 1, 1), "name": "x"})
+    assert doc["scheduled_date"] == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert doc["created_at"] == datetime(2025, 1, 1)
+    assert doc["name"] == "x"
+
+
+def test_date_key_is_strict_and_stored_date_key_is_lenient():
+    with pytest.raises(ValidationError):
+        TypeAdapter(DateKey).validate_python("24/12/2024")
+
+    stored = TypeAdapter(StoredDateKey)
+    assert stored.validate_python(datetime(2024, 12, 24, tzinfo=timezone.utc)) == "2024-12-24"
+    assert stored.validate_python("24/12/2024") == "24/12/2024"
@@ -0,0 +1,99 @@
+import asyncio
+import functools
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import UpdateOne
+
+import server
+from data_transfer import BatchWriter, ImportFormatError, encode_line
+
+
+def _find(collection, query=None):
+    return asyncio.run(collection.find(query or {}, {"_id": 0}).to_list(None))
+
+
+def _dump(*entries):
+    return b"".join(encode_line({"collection": collection, "document": document}) for collection, document in entries)
+
+
+def _amal(amal_id, name="Sholat Dhuha", **fields):
+    return ("amals", {"id": amal_id, "name": name, **fields})
+
+
+def _import(api, payload):
+    return api.post("/api/import", files={"file": ("export.ndjson", payload, "application/x-ndjson")})
+
+
+def test_validate_import_stores_bson_dates_and_search_terms():
+    document = server._validate_import(
+        "daily_notes", "user-b",
+        {"id": "n1", "user_id": "user-a", "date": "2025-03-09", "notes": "bersedekah"},
+        line_number=1,
+    )
+
+    assert document["user_id"] == "user-b"
+    assert document["date"] == datetime(2025, 3, 9, tzinfo=timezone.utc)
+    assert document["search_terms"] == ["sedekah"]
+
+
+def test_validate_import_rejects_invalid_documents():
+    with pytest.raises(ImportFormatError, match="Line 7"):
+        server._validate_import("prayer_tracks", "user-a", {"date": "09/03/2025"}, line_number=7)
+
+
+def test_import_operation_matches_amals_on_their_source_id(monkeypatch):
+    monkeypatch.setattr(server.uuid, "uuid4", lambda: "fresh-id")
+
+    operation = server._import_operation("amals", "user-b", {"id": "AAA", "name": "Sedekah"})
+
+    assert operation == UpdateOne(
+        {"user_id": "user-b", "$or": [{"id": "AAA"}, {"source_id": "AAA"}]},
+        {"$set": {"name": "Sedekah", "source_id": "AAA"}, "$setOnInsert": {"id": "fresh-id"}},
+        upsert=True,
+    )
+
+
+def test_export_imported_into_another_account_twice_has_no_duplicates(api, db, current_user):
+    for amal_id in ("A1", "A2", "A3"):
+        asyncio.run(db.amals.insert_one({"id": amal_id, "user_id": "user-a", "name": "Tilawah"}))
+    dump = api.get("/api/export").content
+
+    current_user["id"] = "user-b"
+    assert _import(api, dump).status_code == 200
+    assert _import(api, dump).status_code == 200
+
+    imported = _find(db.amals, {"user_id": "user-b"})
+    assert len(imported) == 3
+    assert sorted(amal["source_id"] for amal in imported) == ["A1", "A2", "A3"]
+    assert not {amal["id"] for amal in imported} & {"A1", "A2", "A3"}
+    assert asyncio.run(db.search_stats.find_one({"_id": "user-b"}))["docs"] == 3
+
+
+def test_reimporting_own_export_updates_rows_in_place(api, db):
+    asyncio.run(db.amals.insert_one({"id": "A1", "user_id": "user-a", "name": "Tilawah"}))
+
+    response = _import(api, _dump(_amal("A1", name="Tilawah Al-Mulk")))
+
+    assert response.status_code == 200
+    assert [(amal["id"], amal["name"]) for amal in _find(db.amals)] == [("A1", "Tilawah Al-Mulk")]
+
+
+def test_repeated_ids_within_one_file_keep_the_last_row(api, db):
+    response = _import(api, _dump(_amal("AAA", name="Pertama"), _amal("AAA", name="Kedua")))
+
+    assert response.status_code == 200
+    assert [amal["name"] for amal in _find(db.amals)] == ["Kedua"]
+
+
+def test_invalid_line_writes_nothing(api, db, monkeypatch):
+    # Small batches, so the valid lines would already have been flushed by a single pass
+    monkeypatch.setattr(server, "BatchWriter", functools.partial(BatchWriter, batch_size=2))
+    payload = _dump(_amal("A1"), _amal("A2"), _amal("A3")) + b"garbage\n"
+
+    response = _import(api, payload)
+
+    assert response.status_code == 400
+    assert "Line 4" in response.json()["detail"]
+    assert _find(db.amals) == []
+    assert asyncio.run(db.search_stats.find_one({"_id": "user-a"})) is None
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import UpdateOne
+
+from dates import DATE_FIELDS
+from migrate_dates import _build_update, _pending_filter
+
+
+def test_pending_filter_selects_string_fields():
+    assert _pending_filter(DATE_FIELDS["prayer_tracks"]) == {"$or": [{"date": {"$type": "string"}}]}
+
+
+def test_build_update_converts_strings_and_guards_on_old_values():
+    doc = {"_id": 1, "scheduled_date": "2025-03-09", "created_at": "2025-03-09T01:02:03+00:00"}
+    operation = _build_update(doc, DATE_FIELDS["amals"])
+
+    assert operation == UpdateOne(
+        {"_id": 1, "scheduled_date": "2025-03-09", "created_at": "2025-03-09T01:02:03+00:00"},
+        {"$set": {
+            "scheduled_date": datetime(2025, 3, 9, tzinfo=timezone.utc),
+            "created_at": datetime(2025, 3, 9, 1, 2, 3, tzinfo=timezone.utc),
+        }},
+    )
+
+
+def test_build_update_skips_already_migrated_fields():
+    doc = {"_id": 1, "scheduled_date": datetime(2025, 3, 9, tzinfo=timezone.utc), "created_at": "2025-03-09T01:02:03"}
+    operation = _build_update(doc, DATE_FIELDS["amals"])
+
+    assert operation == UpdateOne(
+        {"_id": 1, "created_at": "2025-03-09T01:02:03"},
+        {"$set": {"created_at": datetime(2025, 3, 9, 1, 2, 3, tzinfo=timezone.utc)}},
+    )
+
+
+def test_build_update_returns_none_when_nothing_to_convert():
+    assert _build_update({"_id": 1, "date": datetime(2025, 3, 9, tzinfo=timezone.utc)}, DATE_FIELDS["prayer_tracks"]) is None
+
+
+def test_build_update_raises_value_error_for_unparseable_values():
+    with pytest.raises(ValueError):
+        _build_update({"_id": 1, "date": "kemarin"}, DATE_FIELDS["prayer_tracks"])
@@ -0,0 +1,77 @@
+import math
+
+import pytest
+
+from search import B, K1, query_terms, rank, search_terms_for, stem, tokenize
+
+
+def test_tokenize_lowercases_drops_stopwords_and_joins_elisions():
+    assert tokenize("Saya membaca Al-Qur'an dan berdzikir.") == ["membaca", "quran", "berdzikir"]
+    assert tokenize(None) == []
+
+
+@pytest.mark.parametrize("word", ["jalan", "makan", "selesai", "bulan", "hari", "sedekah"])
+def test_roots_are_left_alone(word):
+    assert stem(word) == word
+
+
+@pytest.mark.parametrize("derived, root", [
+    ("perjalanan", "jalan"),
+    ("makanan", "makan"),
+    ("memperbaiki", "baik"),
+    ("perbaikan", "baik"),
+    ("kebaikan", "baik"),
+    ("perasaan", "rasa"),
+    ("merasa", "rasa"),
+    ("menulis", "tulis"),
+    ("membaca", "baca"),
+    ("mengingat", "ingat"),
+    ("mendoakan", "doa"),
+    ("pengampunan", "ampun"),
+    ("diperhatikan", "hati"),
+    ("bersedekah", "sedekah"),
+    ("pelajaran", "ajar"),
+    ("bekerja", "kerja"),
+    ("sholatnya", "sholat"),
+])
+def test_derived_forms_reduce_to_their_root(derived, root):
+    assert stem(derived) == root
+
+
+def test_unknown_words_only_lose_inflectional_suffixes():
+    assert stem("menyapu") == "menyapu"
+    assert stem("kucingnya") == "kucing"
+
+
+def test_query_terms_are_distinct_stems():
+    assert query_terms("sedekah bersedekah perjalanan") == ["sedekah", "jalan"]
+
+
+def test_search_terms_cover_indexed_fields_only():
+    doc = {"name": "Sholat Dhuha", "notes": "membaca doa", "scheduled_time": "07:00"}
+    assert search_terms_for("amals", doc) == ["sholat", "dhuha", "baca", "doa"]
+
+
+def test_rank_prefers_rarer_terms_and_higher_frequency():
+    candidates = [
+        {"id": "common", "search_terms": ["sholat", "subuh"]},
+        {"id": "both", "search_terms": ["sholat", "tahajud"]},
+        {"id": "repeated", "search_terms": ["sholat", "sholat", "sholat"]},
+    ]
+    ranked = [doc["id"] for _, doc in rank(["sholat", "tahajud"], candidates, total_docs=100)]
+    assert ranked[0] == "both"
+    assert ranked.index("repeated") < ranked.index("common")
+
+
+def test_rank_handles_no_candidates():
+    assert rank(["sholat"], [], total_docs=10) == []
+
+
+def test_rank_normalises_length_against_the_whole_corpus():
+    candidates = [{"id": "short", "search_terms": ["sedekah", "subuh"]}]
+    # A two-term document in a corpus averaging 20 terms is short, so its match counts for more
+    (score, _), = rank(["sedekah"], candidates, total_docs=10, total_terms=200)
+
+    idf = math.log(1 + (10 - 1 + 0.5) / (1 + 0.5))
+    assert score == pytest.approx(idf * (K1 + 1) / (1 + K1 * (1 - B + B * 2 / 20)))
+    assert score > rank(["sedekah"], candidates, total_docs=10)[0][0]
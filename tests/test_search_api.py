@@ -0,0 +1,160 @@
+import asyncio
+
+import search
+import server
+from search import search_terms_for
+
+
+def _stats(db, user_id="user-a"):
+    stats = asyncio.run(db.search_stats.find_one({"_id": user_id})) or {}
+    return {"docs": stats.get("docs", 0), "terms": stats.get("terms", 0)}
+
+
+def _actual_stats(db, user_id="user-a"):
+    docs = []
+    for collection in search.SEARCH_FIELDS:
+        docs += asyncio.run(db[collection].find({"user_id": user_id}).to_list(None))
+    return {"docs": len(docs), "terms": sum(len(doc.get("search_terms") or []) for doc in docs)}
+
+
+def _note(api, day, notes, reflections=None):
+    response = api.post("/api/daily-notes", json={"date": f"2025-03-{day:02d}", "notes": notes, "reflections": reflections})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_stats_follow_creates_updates_and_deletes(api, db):
+    amal = api.post("/api/amal", json={"name": "Sedekah Subuh", "notes": "bersedekah kepada tetangga"}).json()
+    _note(api, 9, "membaca Al-Qur'an")
+    _note(api, 10, "sholat berjamaah")
+    assert _stats(db) == _actual_stats(db) == {"docs": 3, "terms": 8}
+
+    _note(api, 9, "membaca Al-Qur'an satu juz", "merasa lebih tenang")
+    api.put(f"/api/amal/{amal['id']}", json={"notes": "sedekah"})
+    assert _stats(db) == _actual_stats(db)
+
+    assert api.delete(f"/api/amal/{amal['id']}").status_code == 200
+    assert _stats(db) == _actual_stats(db) == {"docs": 2, "terms": 8}
+
+
+def test_import_recounts_search_stats(api, db, current_user):
+    _note(api, 9, "membaca Al-Qur'an")
+    dump = api.get("/api/export").content
+
+    current_user["id"] = "user-b"
+    _note(api, 9, "sholat")
+    api.post("/api/import", files={"file": ("export.ndjson.gz", dump, "application/gzip")})
+
+    assert _stats(db, "user-b") == _actual_stats(db, "user-b") == {"docs": 1, "terms": 2}
+
+
+def test_search_pages_through_ranked_results(api):
+    for day in range(1, 6):
+        _note(api, day, "bersedekah " * day)
+    _note(api, 6, "sholat dhuha")
+
+    pages = [api.get("/api/search", params={"q": "sedekah", "limit": 2, "page": page}).json() for page in (1, 2, 3)]
+
+    assert [page["total"] for page in pages] == [5, 5, 5]
+    results = [result for page in pages for result in page["results"]]
+    assert [result["date"] for result in results] == [f"2025-03-0{day}" for day in (5, 4, 3, 2, 1)]
+    assert all(result["type"] == "daily_note" and "search_terms" not in result for result in results)
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+
+
+def test_search_returns_amals_and_notes(api):
+    api.post("/api/amal", json={"name": "Tilawah", "notes": "membaca surat Al-Mulk"})
+    _note(api, 9, "belajar tafsir surat Al-Mulk")
+
+    response = api.get("/api/search", params={"q": "surat"}).json()
+
+    assert sorted(result["type"] for result in response["results"]) == ["amal", "daily_note"]
+
+
+def test_search_only_sees_the_current_users_documents(api, current_user):
+    _note(api, 9, "bersedekah")
+    current_user["id"] = "user-b"
+
+    assert api.get("/api/search", params={"q": "sedekah"}).json()["total"] == 0
+
+
+def test_search_rejects_overlong_queries(api):
+    assert api.get("/api/search", params={"q": "sedekah " * 30}).status_code == 422
+
+
+def test_find_matches_skips_documents_deleted_after_ranking(db, monkeypatch):
+    asyncio.run(db.daily_notes.insert_one({"id": "n1", "user_id": "user-a", "notes": "sedekah", "search_terms": ["sedekah"]}))
+    rank = search.rank
+
+    def rank_with_deleted(*args):
+        # A candidate that disappears between ranking and loading the page
+        ranked = rank(*args)
+        return [(99.0, {"id": "gone", "collection": "amals"})] + ranked
+    monkeypatch.setattr(search, "rank", rank_with_deleted)
+
+    total, hits = asyncio.run(search.find_matches(db, "user-a", ["sedekah"], page=1, limit=10))
+
+    assert total == 2
+    assert [(collection, doc["id"]) for _, collection, doc in hits] == [("daily_notes", "n1")]
+
+
+def test_backfill_indexes_documents_and_seeds_search_stats(db):
+    asyncio.run(db.amals.insert_one({"id": "a1", "user_id": "user-a", "name": "Sedekah Subuh"}))
+    asyncio.run(db.daily_notes.insert_one({"id": "n1", "user_id": "user-a", "notes": "membaca Al-Qur'an"}))
+
+    asyncio.run(server.backfill_search_index())
+
+    assert asyncio.run(db.amals.find_one({"id": "a1"}))["search_terms"] == ["sedekah", "subuh"]
+    assert _stats(db) == {"docs": 2, "terms": 4}
+    assert asyncio.run(db.migrations.find_one({"_id": server.SEARCH_BACKFILL_ID}))["done"]
+
+
+class _EditedConcurrently:
+    """Database proxy whose amal text is changed by "another request" right after each read."""
+
+    def __init__(self, db, edits):
+        self.db = db
+        self.edits = list(edits)
+
+    def __getattr__(self, name):
+        if name == "amals":
+            return _AmalsProxy(self)
+        return getattr(self.db, name)
+
+
+class _AmalsProxy:
+    def __init__(self, parent):
+        self.parent = parent
+        self.collection = parent.db.amals
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one(self, *args, **kwargs):
+        doc = await self.collection.find_one(*args, **kwargs)
+        if doc and self.parent.edits:
+            notes = self.parent.edits.pop(0)
+            await self.collection.update_one({"id": doc["id"]}, {"$set": {"notes": notes}})
+        return doc
+
+
+def test_update_amal_retries_when_the_text_changes_underneath(api, db, monkeypatch):
+    amal = api.post("/api/amal", json={"name": "Sholat Dhuha"}).json()
+    monkeypatch.setattr(server, "db", _EditedConcurrently(db, ["membaca doa"]))
+
+    response = api.put(f"/api/amal/{amal['id']}", json={"name": "Sholat Tahajud"})
+
+    assert response.status_code == 200
+    stored = asyncio.run(db.amals.find_one({"id": amal["id"]}))
+    assert (stored["name"], stored["notes"]) == ("Sholat Tahajud", "membaca doa")
+    assert stored["search_terms"] == search_terms_for("amals", stored)
+
+
+def test_update_amal_gives_up_after_repeated_conflicts(api, db, monkeypatch):
+    amal = api.post("/api/amal", json={"name": "Sholat Dhuha"}).json()
+    monkeypatch.setattr(server, "db", _EditedConcurrently(db, ["satu", "dua", "tiga"]))
+
+    response = api.put(f"/api/amal/{amal['id']}", json={"name": "Sholat Tahajud"})
+
+    assert response.status_code == 409
+    assert asyncio.run(db.amals.find_one({"id": amal["id"]}))["name"] == "Sholat Dhuha"